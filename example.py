@@ -19,10 +19,11 @@ if __name__ == "__main__":
     ft.add_bandpass(5, 95)
     ft.add_notch(50)
 
-    # Feature extractor with 3 vectorised functions and 1 non-vectorised function
+    # Feature extractor with mav, a fused wl/wamp kernel and an ssc kernel
     fe = TDExtractor()
-    fe.add_vectorised_features([mav, wl, wamp_5])
-    fe.add_features(ssc)
+    fe.add_vectorised_features(mav)
+    fe.add_fused_features(wl_wamp_batched, 2)
+    fe.add_vectorised_features(ssc_batched)
 
     # Create SignalPreprocessor manager object and add the above tasks
     pre = SignalPreprocessor()
@@ -25,10 +25,12 @@ def create_plot(data: np.ndarray,
     if data.ndim == 2:
         nrows = len(data)
         fig = make_subplots(rows=nrows, cols=1, shared_xaxes=True)
-        for i, row in enumerate(data, start=1):
-            fig.add_trace(go.Scatter(y=row, name=f"Ch{i-1}"), row=i, col=1)
+        traces = [go.Scattergl(y=row, name=f"Ch{i}")
+                  for i, row in enumerate(data)]
+        fig.add_traces(traces,
+                       rows=list(range(1, nrows + 1)), cols=[1] * nrows)
     elif data.ndim == 1:
-        fig = go.Figure().add_trace(go.Scatter(y=data, name=f"Ch{0}"))
+        fig = go.Figure().add_trace(go.Scattergl(y=data, name=f"Ch{0}"))
     else:
         raise ValueError("Data dimension is not correct")
     
@@ -6,12 +6,21 @@ A simple multichannel signal preprocessor using the Strategy Pattern.
 
 from abc import ABC, abstractmethod
 from collections.abc import Iterable
-from typing import List, Tuple, Callable
-from scipy.signal import butter, filtfilt, iirnotch
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Callable
+from scipy.signal import butter, iirnotch, sosfilt, sosfilt_zi, sosfiltfilt, \
+    tf2sos
 import numpy as np
 
+from td_features import all_features_batched, ALL_FEATURE_COLUMNS
+
 
 class PreprocessTask(ABC):
+    # Array namespace the task computes with. SignalPreprocessor swaps in
+    # cupy here to run the pipeline on GPU.
+    xp = np
+
     @abstractmethod
     def setup(self) -> None:
         pass
@@ -22,32 +31,48 @@ class PreprocessTask(ABC):
 
 
 class Windower(PreprocessTask):
-    def __init__(self, data_len: int, win_len: int, overlap: int) -> None:
+    def __init__(self, data_len: int, win_len: int, overlap: int,
+                 materialize: bool=True) -> None:
         """Applies a windowing scheme to the multichannel signal.
 
         Args:
             data_len (int): Length of the signal in data points.
             win_len (int): Length of the window in data points.
             overlap (int): Length of the overlap between windows in data points.
+            materialize (bool, optional): Copy the windowed view into one \
+                contiguous buffer. Overlapping windows make the view strided, \
+                so paying a single copy here turns every downstream pass \
+                (filtering, each feature) into sequential reads. The buffer \
+                is reused across `process` calls of the same shape, so copy \
+                the result before the next call if it must outlive it. Set \
+                False for the zero-copy view. Defaults to True.
         """
         self.data_len = data_len
         self.win_len = win_len
         self.overlap = overlap
-        self.windows = None
-    
+        self.materialize = materialize
+        self.step = None
+        self.n_windows = None
+        self.starts = None
+        self._out = None
+
     def setup(self):
         """Generates windowing indices
         """
         if self.data_len <= 0 or self.win_len > self.data_len or self.overlap >= self.win_len:
             raise ValueError("Invalid input arguments for Windower")
-        step = self.win_len - self.overlap
-        start = np.arange(0, self.data_len - self.win_len + 1, step)
-        end = start + self.win_len
-        self.windows = np.column_stack((start, end))
-    
+        self.step = self.win_len - self.overlap
+        self.starts = np.arange(0, self.data_len - self.win_len + 1, self.step)
+        self.n_windows = len(self.starts)
+        self._out = None
+
     def process(self, data: np.ndarray) -> np.ndarray:
         """Windows the input data.
 
+        The windows are built as a strided view into `data` in O(1); when
+        `materialize` is set the view is copied into a contiguous buffer once
+        so downstream stages read sequential memory.
+
         Args:
             data (np.ndarray): Multichannel signal data
 
@@ -57,60 +82,126 @@ class Windower(PreprocessTask):
         """
         if len(data.shape) > 2:
             raise ValueError(f"Dimensions exceeded, got {len(data.shape)}")
-        elif len(data.shape) == 1:
-            data = data[np.newaxis, :]
-            
-        num_channel = data.shape[0]
-        windowed = np.zeros((num_channel, self.windows.shape[0], self.win_len))
-        for ch in range(num_channel):
-            for i, w in enumerate(self.windows):
-                windowed[ch, i] = data[ch, w[0] : w[1]]
-        
-        return np.squeeze(windowed)
+
+        single = len(data.shape) == 1
+        if single:
+            data = data[None, :]
+
+        if self.xp is np:
+            windowed = np.lib.stride_tricks.sliding_window_view(
+                data, self.win_len, axis=-1)[:, ::self.step, :]
+        else:
+            # cupy has no sliding_window_view; build the equivalent view
+            # with the window step folded into the strides
+            s_ch, s_n = data.strides
+            windowed = self.xp.lib.stride_tricks.as_strided(
+                data, (data.shape[0], self.n_windows, self.win_len),
+                (s_ch, self.step * s_n, s_n))
+        if single:
+            windowed = windowed[0]
+        if self.materialize:
+            # One bulk copy into a buffer kept between same-shape calls, so
+            # repeated processing allocates nothing
+            if self._out is None or self._out.shape != windowed.shape \
+                    or self._out.dtype != windowed.dtype:
+                self._out = self.xp.empty(windowed.shape, windowed.dtype)
+            self.xp.copyto(self._out, windowed)
+            windowed = self._out
+
+        return windowed
 
 
 class SignalFilter(PreprocessTask):
-    def __init__(self, fs: int):
+    def __init__(self, fs: int, streaming: bool=False, workers: int=None,
+                 reuse_buffers: bool=False):
         """Applies digital filtration on the signal.
 
         Args:
             fs (int): Sampling frequency of the signal.
+            streaming (bool, optional): Filter forward-only with `sosfilt`, \
+                carrying the filter state between `process` calls so chunks \
+                of a live signal can be fed in sequence. Halves the filter \
+                arithmetic compared to the zero-phase offline mode at the \
+                cost of the usual causal phase delay. Defaults to False.
+            workers (int, optional): Number of threads used to filter rows \
+                in parallel in offline mode. The scipy filter core releases \
+                the GIL, so this scales with cores until memory bandwidth \
+                saturates. Defaults to None (single-threaded).
+            reuse_buffers (bool, optional): Run the zero-phase filter \
+                through a padded scratch buffer kept between `process` calls \
+                of the same shape, with the filter initial state precomputed \
+                in `setup`, instead of letting `sosfiltfilt` redo both on \
+                every call. Worthwhile when the filter runs repeatedly on \
+                same-shape inputs. Defaults to False.
         """
         self.fs = fs
-        self.filters = []
+        self.streaming = streaming
+        self.workers = workers
+        self.reuse_buffers = reuse_buffers
+        self.sos_stack = []
+        self.sos = None
+        self.zi_unit = None
+        self.zi = None
+        self.padlen = None
+        self._scratch = None
 
     def setup(self) -> None:
         if self.fs <= 0:
             raise ValueError("Sampling frequency needs to be a positive value")
-        
-        if len(self.filters) == 0:
+
+        if self.xp is np:
+            self._sosfilt, self._sosfiltfilt = sosfilt, sosfiltfilt
+        else:
+            from cupyx.scipy import signal as xp_signal
+            self._sosfilt = xp_signal.sosfilt
+            self._sosfiltfilt = xp_signal.sosfiltfilt
+
+        if len(self.sos_stack) == 0:
             print("No filters has been added")
-    
+        else:
+            # float32 sections keep float32 inputs in float32 end to end;
+            # float64 inputs still promote the filtering to float64
+            sos = np.vstack(self.sos_stack).astype(np.float32)
+            if self.streaming or self.reuse_buffers:
+                self.zi_unit = self.xp.asarray(sosfilt_zi(sos).astype(sos.dtype))
+                self.zi = None
+            if self.reuse_buffers:
+                # Same default edge padding as sosfiltfilt
+                self.padlen = 3 * (2 * len(sos) + 1 - min((sos[:, 2] == 0).sum(),
+                                                          (sos[:, 5] == 0).sum()))
+                self._scratch = None
+            self.sos = self.xp.asarray(sos)
+
     def add_lowpass(self, cutoff: float, order: int=5) -> None:
-        b, a = butter(order, cutoff / (0.5 * self.fs), btype='low')
-        self.add_filter((b, a))
-    
+        sos = butter(order, cutoff / (0.5 * self.fs), btype='low', output='sos')
+        self.add_filter(sos)
+
     def add_highpass(self, cutoff: float, order: int=5) -> None:
-        b, a = butter(order, cutoff / (0.5 * self.fs), btype='high')
-        self.add_filter((b, a))
-    
+        sos = butter(order, cutoff / (0.5 * self.fs), btype='high', output='sos')
+        self.add_filter(sos)
+
     def add_bandpass(self, lowcut: float, highcut: float, order: int=5) -> None:
-        b, a = butter(order, 
-                      [lowcut / (0.5 * self.fs), highcut / (0.5 * self.fs)], 
-                      btype='band')
-        self.add_filter((b, a))
-    
+        sos = butter(order,
+                     [lowcut / (0.5 * self.fs), highcut / (0.5 * self.fs)],
+                     btype='band', output='sos')
+        self.add_filter(sos)
+
     def add_notch(self, notch_freq: float, Q: float=30) -> None:
         b, a = iirnotch(notch_freq, Q, self.fs)
-        self.add_filter((b, a))
+        self.add_filter(tf2sos(b, a))
 
-    def add_filter(self, filter: Tuple[np.ndarray, np.ndarray]) -> None:
-        """Add custom `ba` filter coefficients
+    def add_filter(self, sos: np.ndarray) -> None:
+        """Add custom `sos` filter sections. `ba` coefficients can be \
+           converted with `scipy.signal.tf2sos`.
         """
-        self.filters.append(filter)
-    
+        self.sos_stack.append(np.atleast_2d(sos))
+
     def process(self, data: np.ndarray) -> np.ndarray:
-        """Applies the list of filter on the last axis (inner most) of the data.
+        """Applies the filter cascade on the last axis (inner most) of the data.
+
+        All added filters are concatenated into a single second-order-section
+        cascade, so the data is traversed by one forward/backward pass no
+        matter how many filters were added.
 
         Args:
             data (np.ndarray): Multichannel signal data
@@ -118,12 +209,60 @@ class SignalFilter(PreprocessTask):
         Returns:
             np.ndarray: Filtered signal data
         """
-        res = data
-        for filter in self.filters:
-            res = filtfilt(*filter, res)
-        
-        return res
-    
+        if self.sos is None:
+            return data
+
+        if self.streaming:
+            if self.zi is None:
+                # Steady-state response to the first sample avoids a startup
+                # transient, broadcast over the leading (channel) axes
+                zi_shape = (len(self.sos),) + (1,) * (data.ndim - 1) + (2,)
+                self.zi = self.zi_unit.reshape(zi_shape) * data[..., :1]
+            res, self.zi = self._sosfilt(self.sos, data, axis=-1, zi=self.zi)
+            return res
+
+        work = data
+        if data.ndim > 2 and data.flags['C_CONTIGUOUS']:
+            # One flat (C*W, N) batch keeps scipy on a single 2D walk
+            work = data.reshape(-1, data.shape[-1])
+
+        if self.reuse_buffers and work.shape[-1] > self.padlen:
+            return self._filtfilt_reuse(work).reshape(data.shape)
+
+        if self.xp is np and self.workers and self.workers > 1 \
+                and work.ndim >= 2 and work.shape[0] > 1:
+            n = min(self.workers, work.shape[0])
+            with ThreadPoolExecutor(max_workers=n) as pool:
+                parts = pool.map(partial(sosfiltfilt, self.sos, axis=-1),
+                                 np.array_split(work, n))
+            return np.concatenate(list(parts)).reshape(data.shape)
+
+        return self._sosfiltfilt(self.sos, work, axis=-1).reshape(data.shape)
+
+    def _filtfilt_reuse(self, data: np.ndarray) -> np.ndarray:
+        """Zero-phase filtering through a persistent odd-padded scratch \
+           buffer, equivalent to `sosfiltfilt` with its default padding but \
+           without the per-call extension allocation and zi solve.
+        """
+        p = self.padlen
+        n = data.shape[-1]
+        shape = data.shape[:-1] + (n + 2 * p,)
+        if self._scratch is None or self._scratch.shape != shape \
+                or self._scratch.dtype != data.dtype:
+            self._scratch = self.xp.empty(shape, data.dtype)
+        ext = self._scratch
+        ext[..., p:p + n] = data
+        ext[..., :p] = 2 * data[..., :1] - data[..., p:0:-1]
+        ext[..., p + n:] = 2 * data[..., -1:] - data[..., -2:-p - 2:-1]
+
+        zi = self.zi_unit.reshape(
+            (len(self.sos),) + (1,) * (data.ndim - 1) + (2,))
+        res, _ = self._sosfilt(self.sos, ext, axis=-1, zi=zi * ext[..., :1])
+        res = res[..., ::-1]
+        res, _ = self._sosfilt(self.sos, res, axis=-1, zi=zi * res[..., :1])
+
+        return res[..., ::-1][..., p:p + n]
+
 
 class TDExtractor(PreprocessTask):
     def __init__(self):
@@ -131,6 +270,9 @@ class TDExtractor(PreprocessTask):
         """
         self.feature_methods: List[Callable] = []
         self.vec = []
+        self.widths = []
+        self.fused_cols = None
+        self._run_plan = None
 
     def add_vectorised_features(self, feature_methods):
         """Add vectorised helper functions for extracting time-domain features.
@@ -142,9 +284,11 @@ class TDExtractor(PreprocessTask):
         if isinstance(feature_methods, Iterable):
             self.feature_methods.extend(feature_methods)
             self.vec.extend([True] * len(feature_methods))
+            self.widths.extend([1] * len(feature_methods))
         else:
             self.feature_methods.append(feature_methods)
             self.vec.append(True)
+            self.widths.append(1)
 
     def add_features(self, feature_methods):
         """Add helper functions for extracting time-domain features.
@@ -156,53 +300,153 @@ class TDExtractor(PreprocessTask):
         if isinstance(feature_methods, Iterable):
             self.feature_methods.extend(feature_methods)
             self.vec.extend([False] * len(feature_methods))
+            self.widths.extend([1] * len(feature_methods))
         else:
             self.feature_methods.append(feature_methods)
             self.vec.append(False)
+            self.widths.append(1)
+
+    def add_fused_features(self, feature_method: Callable, n_features: int):
+        """Add a vectorised function that extracts several features in one pass.
+
+        Fused functions share intermediate results (e.g. one `diff` + `abs`
+        sweep for both `wl` and `wamp`), so the windowed data is only streamed
+        through memory once for the whole group.
+
+        Args:
+            feature_method: Vectorised function that takes a single ndarray as\
+                parameter and returns a tuple of `n_features` feature arrays.
+            n_features (int): Number of feature arrays the function returns.
+        """
+        self.feature_methods.append(feature_method)
+        self.vec.append(True)
+        self.widths.append(n_features)
 
     def setup(self):
+        """Specialises the extraction plan for the added features.
+
+        Installs the all-in-one kernel when every feature belongs to the
+        known time-domain set, and otherwise compiles the per-feature
+        dispatch (vectorised / fused / per-window, output column) into a
+        list of closures so `process` runs it with no branching.
+        """
         if not self.feature_methods:
             raise ValueError("No features has been added")
-        
+
+        self.fused_cols = None
+        if self.xp is np and \
+                all(method in ALL_FEATURE_COLUMNS for method in self.feature_methods):
+            cols = []
+            for method, width in zip(self.feature_methods, self.widths):
+                rows = ALL_FEATURE_COLUMNS[method]
+                if len(rows) != width:
+                    cols = None
+                    break
+                cols.extend(rows)
+            self.fused_cols = cols
+        self._run_plan = self._compile_plan()
+
+    def _compile_plan(self) -> List[Callable]:
+        """Builds the list of `(data, res)` writers `process` executes.
+        """
+        if self.fused_cols is not None:
+            def write_fused(data, res, rows=tuple(self.fused_cols)):
+                fused = all_features_batched(data)
+                for i, row in enumerate(rows):
+                    res[i] = fused[row]
+            return [write_fused]
+
+        plan = []
+        col = 0
+        for method, vec, width in zip(self.feature_methods, self.vec,
+                                      self.widths):
+            if width > 1:
+                def write(data, res, method=method, col=col):
+                    for j, feature in enumerate(method(data)):
+                        res[col + j] = feature
+            elif vec:
+                def write(data, res, method=method, col=col):
+                    res[col] = method(data)
+            else:
+                def write(data, res, method=method, col=col, xp=self.xp):
+                    res[col] = xp.apply_along_axis(method, axis=-1, arr=data)
+            plan.append(write)
+            col += width
+        return plan
+
+
     def process(self, data: np.ndarray) -> np.ndarray:
         """Applies the feature methods for feature extraction over the last axis
 
+        Features are accumulated in a float32, feature-major `(F, C, W)` buffer
+        so every feature is written as one contiguous slab, then returned as a
+        `(C, W, F)` view.
+
         Args:
             data (np.ndarray): Multichannel signal data
 
         Returns:
             np.ndarray: Array of features
         """
-        if data.ndim == 2:
-            data = data[np.newaxis, :]
+        single = data.ndim == 2
+        if single:
+            data = data[None, :]
 
-        res = np.zeros((data.shape[0], data.shape[1], len(self.feature_methods)))
-        for i, method in enumerate(self.feature_methods):
-            if self.vec[i]:
-                res[:, :, i] = method(data)
-            else:
-                res[:, :, i] = np.apply_along_axis(method, axis=-1, arr=data)
-        
-        return np.squeeze(res)
+        data = self.xp.ascontiguousarray(data, dtype=np.float32)
+        res = self.xp.empty((sum(self.widths), data.shape[0], data.shape[1]),
+                            dtype=np.float32)
+        for write in self._run_plan:
+            write(data, res)
+
+        out = self.xp.moveaxis(res, 0, -1)
+        return out[0] if single else out
 
 
 class SignalPreprocessor:
-    def __init__(self):
+    def __init__(self, dtype=np.float32, xp=np):
         """Manager class for PreprocessTask
+
+        Args:
+            dtype (optional): Data type the input is cast to before the first \
+                task runs. float32 halves the memory traffic of every stage \
+                compared to float64. Pass None to keep the input dtype.
+            xp (optional): Array namespace the tasks compute with. Pass \
+                `cupy` to run the pipeline on GPU (worthwhile for batches of \
+                roughly a million samples and up); numba-fused feature \
+                kernels are CPU-only and fall back to the per-method path. \
+                Defaults to numpy.
         """
         self.tasks: List[PreprocessTask] = []
+        self.dtype = dtype
+        self.xp = xp
 
     def add_tasks(self, tasks: PreprocessTask):
-        """Add tasks to the preprocessor manager. Order matters. 
+        """Add tasks to the preprocessor manager. Order matters.
 
         Args:
             tasks (PreprocessTask): Child class of PreprocessTask
         """
-        if isinstance(tasks, Iterable):
-            self.tasks.extend(tasks)
-        else:
-            self.tasks.append(tasks)
+        if not isinstance(tasks, Iterable):
+            tasks = [tasks]
+        for task in tasks:
+            task.xp = self.xp
+            self.tasks.append(task)
     
+    def optimize_order(self):
+        """Moves filtering before windowing where the two are adjacent.
+
+        With overlapping windows every sample appears in several windows, so
+        filtering after windowing redoes the same work per overlap (5x for
+        the example's 50/40 scheme) on top of the per-window padding cost.
+        The filters are LTI, so filtering the raw signal first is equivalent
+        except near window edges, where the full signal provides real
+        context instead of filtfilt edge padding. Call before `setup_tasks`.
+        """
+        for i in range(len(self.tasks) - 1):
+            if (isinstance(self.tasks[i], Windower)
+                    and isinstance(self.tasks[i + 1], SignalFilter)):
+                self.tasks[i], self.tasks[i + 1] = self.tasks[i + 1], self.tasks[i]
+
     def setup_tasks(self):
         """Setup all tasks
         """
@@ -219,7 +463,9 @@ class SignalPreprocessor:
         Returns:
             _type_: Preprocessed data
         """
-        res = data
+        res = self.xp.asarray(data)
+        if self.dtype is not None:
+            res = self.xp.ascontiguousarray(res, dtype=self.dtype)
         for task in self.tasks:
             res = task.process(res)
         
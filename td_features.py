@@ -1,4 +1,5 @@
 import numpy as np
+from numba import njit, prange
 
 # Vectorised
 def rms(w):
@@ -8,7 +9,7 @@ def mav(w):
     return np.mean(np.abs(w), axis=-1)
 
 def zc(w):
-    return np.count_nonzero(np.diff(np.sign(w), axis=-1), axis=-1)
+    return np.sum((w[..., :-1] * w[..., 1:]) < 0, axis=-1)
 
 def wl(w):
     return np.sum(np.abs(np.diff(w, axis=-1)), axis=-1)
@@ -16,7 +17,89 @@ def wl(w):
 def wamp_5(w):
     return np.sum(np.abs(np.diff(w, axis=-1)) > 5, axis=-1)
 
-# Non-vectorised
 def ssc(w):
-    diff = np.diff(w)
-    return np.sum((diff[:-1] * diff[1:]) < 0)
+    diff = np.diff(w, axis=-1)
+    return np.sum((diff[..., :-1] * diff[..., 1:]) < 0, axis=-1)
+
+# Numba-compiled, batched over (channel, window, sample) arrays
+@njit(parallel=True, fastmath=True, cache=True)
+def ssc_batched(x):
+    C, W, N = x.shape
+    out = np.empty((C, W), np.int64)
+    for c in prange(C):
+        for w in range(W):
+            cnt = 0
+            prev = x[c, w, 1] - x[c, w, 0]
+            for k in range(2, N):
+                d = x[c, w, k] - x[c, w, k - 1]
+                if prev * d < 0:
+                    cnt += 1
+                prev = d
+            out[c, w] = cnt
+    return out
+
+@njit(parallel=True, fastmath=True, cache=True)
+def wl_wamp_batched(x, thr=5.0):
+    C, W, N = x.shape
+    wl_out = np.empty((C, W), np.float64)
+    wamp_out = np.empty((C, W), np.int64)
+    for c in prange(C):
+        for w in range(W):
+            total = 0.0
+            cnt = 0
+            for k in range(1, N):
+                ad = abs(x[c, w, k] - x[c, w, k - 1])
+                total += ad
+                if ad > thr:
+                    cnt += 1
+            wl_out[c, w] = total
+            wamp_out[c, w] = cnt
+    return wl_out, wamp_out
+
+@njit(parallel=True, fastmath=True, cache=True)
+def all_features_batched(x, thr=5.0):
+    C, W, N = x.shape
+    out = np.empty((6, C, W), x.dtype)
+    for c in prange(C):
+        for w in range(W):
+            sum_abs = 0.0
+            sum_sq = 0.0
+            sum_abs_diff = 0.0
+            wamp_cnt = 0
+            zc_cnt = 0
+            ssc_cnt = 0
+            prev_d = 0.0
+            for k in range(N):
+                v = x[c, w, k]
+                sum_abs += abs(v)
+                sum_sq += v * v
+                if k > 0:
+                    if x[c, w, k - 1] * v < 0:
+                        zc_cnt += 1
+                    d = v - x[c, w, k - 1]
+                    ad = abs(d)
+                    sum_abs_diff += ad
+                    if ad > thr:
+                        wamp_cnt += 1
+                    if k > 1 and prev_d * d < 0:
+                        ssc_cnt += 1
+                    prev_d = d
+            out[0, c, w] = sum_abs / N
+            out[1, c, w] = np.sqrt(sum_sq / N)
+            out[2, c, w] = sum_abs_diff
+            out[3, c, w] = wamp_cnt
+            out[4, c, w] = zc_cnt
+            out[5, c, w] = ssc_cnt
+    return out
+
+# Row index of each feature function in the all_features_batched output
+ALL_FEATURE_COLUMNS = {
+    mav: (0,),
+    rms: (1,),
+    wl: (2,),
+    wamp_5: (3,),
+    zc: (4,),
+    ssc: (5,),
+    ssc_batched: (5,),
+    wl_wamp_batched: (2, 3),
+}